@@ -1,4 +1,11 @@
 import os
+import re
+import time
+import asyncio
+import secrets
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from typing import Tuple, Optional
 
@@ -14,6 +21,7 @@ from telegram.ext import (
     MessageHandler,
     ContextTypes,
     ConversationHandler,
+    PicklePersistence,
     filters,
 )
 
@@ -33,6 +41,20 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN missing in environment")
 
+# Webhook mode (production): Telegram pushes updates to PUBLIC_URL/<token>.
+# Leave USE_WEBHOOK unset (or 0/false) to fall back to long polling for local dev.
+USE_WEBHOOK = os.getenv("USE_WEBHOOK", "").strip().lower() in ("1", "true", "yes")
+# Telegram echoes this in X-Telegram-Bot-Api-Secret-Token and PTB rejects updates
+# without it. A random one is fine: run_webhook re-registers it on every start.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+PUBLIC_URL = (os.getenv("PUBLIC_URL") or "").rstrip("/")
+WEBHOOK_PORT = int(os.getenv("PORT", 8443))
+if USE_WEBHOOK and not PUBLIC_URL:
+    raise RuntimeError("PUBLIC_URL missing in environment (required when USE_WEBHOOK is set)")
+
+# user_data and conversation states survive restarts via this file
+PERSISTENCE_FILE = os.getenv("BOT_STATE_FILE", "bot_state.pkl")
+
 # ===== CONVERSATION STATES =====
 (
     CHOOSING,
@@ -45,23 +67,66 @@ if not BOT_TOKEN:
 ) = range(7)
 
 # ===== HELPERS =====
-def main_menu_keyboard() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("🟢 Buy", callback_data="BUY"),
-         InlineKeyboardButton("🔴 Sell", callback_data="SELL")],
-        [InlineKeyboardButton("❌ Cancel", callback_data="CANCEL")]
-    ])
-
-def confirm_keyboard(action: str) -> InlineKeyboardMarkup:
+def _build_confirm_keyboard(action: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("✅ Confirm", callback_data=f"{action}_CONFIRM"),
          InlineKeyboardButton("↩️ Back", callback_data="BACK"),
          InlineKeyboardButton("❌ Cancel", callback_data="CANCEL")]
     ])
 
+# Keyboards never change, so build them once and reuse (PTB markup is immutable)
+_MAIN_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🟢 Buy", callback_data="BUY"),
+     InlineKeyboardButton("🔴 Sell", callback_data="SELL")],
+    [InlineKeyboardButton("❌ Cancel", callback_data="CANCEL")]
+])
+_BUY_CONFIRM = _build_confirm_keyboard("BUY")
+_SELL_CONFIRM = _build_confirm_keyboard("SELL")
+_CONFIRM_KEYBOARDS = {"BUY": _BUY_CONFIRM, "SELL": _SELL_CONFIRM}
+
+def main_menu_keyboard() -> InlineKeyboardMarkup:
+    return _MAIN_MENU
+
+def confirm_keyboard(action: str) -> InlineKeyboardMarkup:
+    return _CONFIRM_KEYBOARDS.get(action) or _build_confirm_keyboard(action)
+
+# Solana mint addresses are 32-44 chars of base58 (no 0, O, I or l)
+_MINT_RE = re.compile(r"[1-9A-HJ-NP-Za-km-z]{32,44}")
+
 def is_valid_mint(mint: str) -> bool:
-    # Basic sanity checks for Solana mint addresses
-    return len(mint.strip()) >= 32 and " " not in mint
+    # Callers pass already-stripped message text
+    return _MINT_RE.fullmatch(mint) is not None
+
+# ===== RATE LIMITING =====
+# Per-user token bucket in front of the callback handlers so button mashing
+# doesn't burn Telegram API calls (and 429s) for everyone on the loop.
+RATE_PER_SEC = 2.0
+RATE_BURST = 4.0
+# user_id -> (tokens, last_ts). An idle bucket is full again after RATE_BURST / RATE_PER_SEC
+# seconds, so expiring it then loses nothing and keeps the map from growing forever.
+_buckets: "TTLCache[int, Tuple[float, float]]" = TTLCache(maxsize=10000, ttl=RATE_BURST / RATE_PER_SEC)
+
+def _take_token(user_id: int) -> bool:
+    now = time.monotonic()
+    tokens, last_ts = _buckets.get(user_id, (RATE_BURST, now))
+    tokens = min(RATE_BURST, tokens + (now - last_ts) * RATE_PER_SEC)
+    if tokens < 1:
+        _buckets[user_id] = (tokens, now)
+        return False
+    _buckets[user_id] = (tokens - 1, now)
+    return True
+
+def rate_limit(handler):
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user and not _take_token(user.id):
+            if update.callback_query:
+                await update.callback_query.answer("Slow down", show_alert=False)
+            # None keeps the conversation in its current state
+            return None
+        return await handler(update, context)
+    return wrapper
 
 def parse_amount(text: str) -> Optional[float]:
     try:
@@ -93,23 +158,27 @@ async def cancel_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 # ===== CALLBACK HANDLERS (BUTTONS) =====
+async def answer_and_edit(query, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+    # The callback answer and the message edit are independent API calls; overlap them
+    await asyncio.gather(query.answer(), query.edit_message_text(text, reply_markup=reply_markup))
+
+@rate_limit
 async def choose_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
 
     if query.data == "BUY":
         context.user_data["action"] = "BUY"
-        await query.edit_message_text("Buy selected.\nSend the token mint address:")
+        await answer_and_edit(query, "Buy selected.\nSend the token mint address:")
         return BUY_ASK_MINT
 
     if query.data == "SELL":
         context.user_data["action"] = "SELL"
-        await query.edit_message_text("Sell selected.\nSend the token mint address:")
+        await answer_and_edit(query, "Sell selected.\nSend the token mint address:")
         return SELL_ASK_MINT
 
     if query.data == "CANCEL":
         context.user_data.clear()
-        await query.edit_message_text("Cancelled. Use /start to begin again.")
+        await answer_and_edit(query, "Cancelled. Use /start to begin again.")
         return ConversationHandler.END
 
     if query.data == "BACK":
@@ -117,11 +186,11 @@ async def choose_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data.pop("action", None)
         context.user_data.pop("mint", None)
         context.user_data.pop("amount", None)
-        await query.edit_message_text("Choose an action:", reply_markup=main_menu_keyboard())
+        await answer_and_edit(query, "Choose an action:", reply_markup=main_menu_keyboard())
         return CHOOSING
 
     # Confirms handled in dedicated handlers below
-    await query.edit_message_text("Unknown option. Use /start.")
+    await answer_and_edit(query, "Unknown option. Use /start.")
     return ConversationHandler.END
 
 # ===== BUY FLOW =====
@@ -155,11 +224,13 @@ async def buy_receive_amount(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
     return BUY_CONFIRM
 
+@rate_limit
 async def buy_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
 
     if query.data == "BUY_CONFIRM":
+        # Answer right away; the edit has to wait for the swap result
+        await query.answer()
         mint = context.user_data.get("mint")
         amount = context.user_data.get("amount")
         # TODO: Wire this to your Jupiter swap execution
@@ -171,10 +242,10 @@ async def buy_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if query.data in ("BACK", "CANCEL"):
         context.user_data.clear()
-        await query.edit_message_text("Cancelled. Use /start to begin again.")
+        await answer_and_edit(query, "Cancelled. Use /start to begin again.")
         return ConversationHandler.END
 
-    await query.edit_message_text("Unknown selection. Use /start.")
+    await answer_and_edit(query, "Unknown selection. Use /start.")
     return ConversationHandler.END
 
 # ===== SELL FLOW =====
@@ -208,11 +279,13 @@ async def sell_receive_amount(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
     return SELL_CONFIRM
 
+@rate_limit
 async def sell_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    await query.answer()
 
     if query.data == "SELL_CONFIRM":
+        # Answer right away; the edit has to wait for the swap result
+        await query.answer()
         mint = context.user_data.get("mint")
         amount = context.user_data.get("amount")
         # TODO: Wire this to your Jupiter swap execution
@@ -224,14 +297,23 @@ async def sell_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if query.data in ("BACK", "CANCEL"):
         context.user_data.clear()
-        await query.edit_message_text("Cancelled. Use /start to begin again.")
+        await answer_and_edit(query, "Cancelled. Use /start to begin again.")
         return ConversationHandler.END
 
-    await query.edit_message_text("Unknown selection. Use /start.")
+    await answer_and_edit(query, "Unknown selection. Use /start.")
     return ConversationHandler.END
 
 # ===== SWAP EXECUTION (STUB) =====
+# Swaps do blocking HTTP + signing work; run them off the event loop so one
+# in-flight swap doesn't stall every other user's callbacks.
+_SWAP_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="swap")
+
 async def perform_swap_stub(direction: str, mint: str, amount_sol: float = None, amount_tokens: float = None) -> Tuple[bool, str]:
+    return await asyncio.get_running_loop().run_in_executor(
+        _SWAP_POOL, _do_swap_sync, direction, mint, amount_sol, amount_tokens
+    )
+
+def _do_swap_sync(direction: str, mint: str, amount_sol: Optional[float], amount_tokens: Optional[float]) -> Tuple[bool, str]:
     # Placeholder. Here you will:
     # 1) Build a Jupiter route (quote)
     # 2) Build a transaction
@@ -245,7 +327,12 @@ async def perform_swap_stub(direction: str, mint: str, amount_sol: float = None,
 
 # ===== CONVERSATION WIRES =====
 def build_application():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .persistence(PicklePersistence(filepath=PERSISTENCE_FILE))
+        .build()
+    )
 
     conv = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -266,6 +353,8 @@ def build_application():
         },
         fallbacks=[CommandHandler("cancel", cancel_all)],
         allow_reentry=True,
+        name="trade_conversation",
+        persistent=True,
     )
 
     app.add_handler(conv)
@@ -278,6 +367,16 @@ async def on_startup(app):
 def main():
     app = build_application()
     app.post_init = on_startup
+    if USE_WEBHOOK:
+        print(f"[BOT] Starting webhook on port {WEBHOOK_PORT}...")
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=WEBHOOK_PORT,
+            url_path=BOT_TOKEN,
+            webhook_url=f"{PUBLIC_URL}/{BOT_TOKEN}",
+            secret_token=WEBHOOK_SECRET,
+        )
+        return
     print("[BOT] Starting polling...")
     app.run_polling(close_loop=False)
 
@@ -1,62 +1,179 @@
 import os
 import time
-import json
-import requests
-from typing import Optional, List
-from datetime import datetime, timezone
+import logging
+import random
+import signal
+import asyncio
+from itertools import islice
+import aiohttp
+import orjson
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
+from typing import Optional, List, FrozenSet, Tuple
 from dotenv import load_dotenv
 
 # ===== LOAD ENV =====
 local_env_path = os.path.join(os.path.dirname(__file__), ".env")
 user_env_path = r"C:\Users\HP\.env"
 
+env_path = None
 if os.path.exists(local_env_path):
-    load_dotenv(dotenv_path=local_env_path)
-    print(f"[ENV] Loaded from {local_env_path}")
+    env_path = local_env_path
 elif os.path.exists(user_env_path):
-    load_dotenv(dotenv_path=user_env_path)
-    print(f"[ENV] Loaded from {user_env_path}")
+    env_path = user_env_path
+if env_path:
+    load_dotenv(dotenv_path=env_path)
+
+# ===== LOGGING =====
+# Configured after .env so LOG_LEVEL can live there too
+LOG_LEVEL_NAME = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+_log_level = getattr(logging, LOG_LEVEL_NAME, None)
+logging.basicConfig(
+    level=_log_level if isinstance(_log_level, int) else logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger("watcher")
+if not isinstance(_log_level, int):
+    logger.warning("[ENV] Unknown LOG_LEVEL %r — using INFO.", LOG_LEVEL_NAME)
+
+if env_path:
+    logger.info("[ENV] Loaded from %s", env_path)
 else:
-    print("[ENV] No .env file found in either location — relying on system environment variables.")
+    logger.info("[ENV] No .env file found in either location — relying on system environment variables.")
 
 # ===== CONFIG =====
 HELIUS_API_KEY = os.getenv("HELIUS_API_KEY")
 WATCH_WALLET = os.getenv("WATCH_WALLET")
 TELEGRAM_BOT_TOKEN = os.getenv("BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("CHAT_ID")
+_TG_ENABLED = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+_MSG_HEADER = f"New activity on <b>{WATCH_WALLET}</b>\n"
 
 STATE_FILE = "last_sig.json"
 POLL_INTERVAL_SEC = 20   # safer for Helius free tier
 MAX_BACKOFF = 300        # cap exponential backoff at 5 minutes
+MAX_IDLE_INTERVAL = 120  # slowest poll rate while the wallet is quiet
+TX_PAGE_SIZE = 20        # Helius page size per transactions request
+MAX_TX_PAGES = 10        # catch up on at most this many pages per poll
+HELIUS_METADATA_BATCH = 100  # Helius token-metadata accepts at most 100 mints per request
+POLL_JITTER = 0.1        # ±10% so multiple watchers don't poll in lockstep
+MAX_TRANSFER_SCAN = 8    # real swaps rarely carry more token transfers than this
+# All alerts go to one chat, so Telegram's per-chat limit is the one that binds:
+# about 1 msg/s in a private chat, 20 msg/min in a group/channel (negative chat id).
+if (TELEGRAM_CHAT_ID or "").startswith("-"):
+    TELEGRAM_RATE = (20, 60)
+else:
+    TELEGRAM_RATE = (1, 1)
+TELEGRAM_DEFAULT_RETRY_AFTER = 5  # seconds, if a 429 doesn't say how long to wait
+SEND_QUEUE_SIZE = 1000
+SHUTDOWN_DRAIN_SEC = 30  # how long to keep sending queued alerts on exit
+
+HELIUS_BASE_URL = "https://api.helius.xyz/v0"
+HELIUS_METADATA_URL = f"{HELIUS_BASE_URL}/token-metadata?api-key={HELIUS_API_KEY}"
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# ===== HTTP SESSION =====
+# One pooled session so polls reuse keep-alive connections and concurrent
+# requests overlap. Created lazily because aiohttp needs a running loop.
+SESSION: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    global SESSION
+    if SESSION is None or SESSION.closed:
+        SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=16, ttl_dns_cache=300)
+        )
+    return SESSION
+
+async def close_session():
+    if SESSION is not None and not SESSION.closed:
+        await SESSION.close()
+
+# Same policy the requests-based session had via urllib3 Retry:
+# up to 3 retries on 429/5xx and connection errors, 0.5s/1s/2s backoff.
+RETRY_STATUSES: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+
+async def http_request(method: str, url: str, retry_on: FrozenSet[int] = RETRY_STATUSES,
+                       **kwargs) -> aiohttp.ClientResponse:
+    # The body is read before returning, so resp.read() and resp.raise_for_status()
+    # still work after the connection has gone back to the pool.
+    for attempt in range(HTTP_RETRIES + 1):
+        last_try = attempt == HTTP_RETRIES
+        try:
+            async with get_session().request(method, url, **kwargs) as resp:
+                await resp.read()
+                if resp.status not in retry_on or last_try:
+                    return resp
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if last_try:
+                raise
+        await asyncio.sleep(HTTP_BACKOFF * 2 ** attempt)
 
 # ===== STATE STORAGE =====
+_persisted_sig: Optional[str] = None   # value currently on disk
+
 def load_last_signature() -> Optional[str]:
+    global _persisted_sig
     if not os.path.exists(STATE_FILE):
         return None
     try:
-        with open(STATE_FILE, "r") as f:
-            data = json.load(f)
-        return data.get("last_signature")
+        with open(STATE_FILE, "rb") as f:
+            data = orjson.loads(f.read())
+        _persisted_sig = data.get("last_signature")
+        return _persisted_sig
     except Exception:
         return None
 
-def save_last_signature(sig: str):
-    with open(STATE_FILE, "w") as f:
-        json.dump({"last_signature": sig}, f)
+def save_last_signature(sig: Optional[str]):
+    # Write-then-rename so a crash never leaves a truncated state file
+    global _persisted_sig
+    if not sig or sig == _persisted_sig:
+        return
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps({"last_signature": sig}))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, STATE_FILE)
+    _persisted_sig = sig
 
 # ===== HELIUS REST FETCH =====
-def fetch_recent_transactions(address: str, before: Optional[str] = None, limit: int = 20) -> List[dict]:
-    url = f"https://api.helius.xyz/v0/addresses/{address}/transactions?api-key={HELIUS_API_KEY}&limit={limit}"
+async def fetch_recent_transactions(address: str, before: Optional[str] = None, until: Optional[str] = None,
+                                    limit: int = 20) -> List[dict]:
+    # Newest first; `until` stops at (and excludes) an already-seen signature
+    url = f"{HELIUS_BASE_URL}/addresses/{address}/transactions?api-key={HELIUS_API_KEY}&limit={limit}"
     if before:
         url += f"&before={before}"
-    resp = requests.get(url, timeout=20)
+    if until:
+        url += f"&until={until}"
+    resp = await http_request("GET", url, timeout=aiohttp.ClientTimeout(total=20))
     resp.raise_for_status()
-    return resp.json() or []
+    return orjson.loads(await resp.read()) or []
+
+async def fetch_new_transactions(address: str, until: Optional[str]) -> List[dict]:
+    # Page back with `before` until a short page shows the `until` boundary was reached,
+    # so a burst longer than one page during an idle sleep isn't silently skipped.
+    txs: List[dict] = []
+    before = None
+    for _ in range(MAX_TX_PAGES):
+        page = await fetch_recent_transactions(address, before=before, until=until, limit=TX_PAGE_SIZE)
+        txs.extend(page)
+        # Without a known boundary (first run) just take the newest page
+        if len(page) < TX_PAGE_SIZE or not until:
+            return txs
+        before = page[-1].get("signature")
+        if not before:
+            break
+    logger.warning("[GAP] Hit the %d-transaction catch-up cap since %s; older ones may have been skipped.",
+                   len(txs), until)
+    return txs
 
 # ===== TELEGRAM SEND =====
-def send_telegram_text(text: str):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        print("[TELEGRAM] Bot token or chat ID missing — skipping send.")
+async def send_telegram_text(text: str):
+    if not _TG_ENABLED:
+        logger.debug("[TELEGRAM] Bot token or chat ID missing — skipping send.")
         return
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
@@ -65,40 +182,146 @@ def send_telegram_text(text: str):
         "parse_mode": "HTML",
         "disable_web_page_preview": True
     }
-    r = requests.post(url, json=payload, timeout=15)
-    if r.status_code != 200:
-        print(f"[TELEGRAM] Failed: {r.status_code} {r.text}")
+    body = orjson.dumps(payload)
+    while True:
+        try:
+            # 429s are handled below using Telegram's own retry_after
+            r = await http_request("POST", url, retry_on=RETRY_STATUSES - {429}, data=body,
+                                   headers=JSON_HEADERS, timeout=aiohttp.ClientTimeout(total=15))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("[TELEGRAM] Failed: %s", e)
+            return
+        if r.status == 429:
+            retry_after = _telegram_retry_after(await r.read(), r.headers)
+            logger.warning("[TELEGRAM] Rate limited. Re-sending in %ss...", retry_after)
+            await asyncio.sleep(retry_after)
+            continue
+        if r.status != 200:
+            logger.warning("[TELEGRAM] Failed: %s %s", r.status, await r.text())
+        return
+
+def _telegram_retry_after(body: bytes, headers) -> float:
+    # Telegram reports the wait in {"parameters": {"retry_after": N}}
+    try:
+        return float(orjson.loads(body)["parameters"]["retry_after"])
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+        pass
+    try:
+        return float(headers.get("Retry-After", TELEGRAM_DEFAULT_RETRY_AFTER))
+    except (TypeError, ValueError):
+        return TELEGRAM_DEFAULT_RETRY_AFTER
+
+# Alerts are queued by the poll loop and drained by a single sender task,
+# so a burst of wallet activity is paced instead of tripping Telegram 429s.
+# The queue and limiter are built in main() so they bind to the running loop.
+# Each item carries its tx signature, which is persisted only once the alert
+# has been sent: a restart then re-fetches anything still waiting in the queue.
+SendItem = Tuple[str, Optional[str]]   # (message, signature to persist after sending)
+
+async def telegram_sender(send_queue: "asyncio.Queue[SendItem]", limiter: AsyncLimiter):
+    while True:
+        text, sig = await send_queue.get()
+        try:
+            async with limiter:
+                await send_telegram_text(text)
+            save_last_signature(sig)
+        finally:
+            send_queue.task_done()
 
 # ===== TOKEN METADATA LOOKUP =====
-_token_cache = {}
+UNKNOWN_META = ("unknown", "unknown")
+
+# Hits are kept for a day; failed/empty lookups only for 5 minutes so a
+# transient Helius error doesn't pin a mint to "unknown" until restart.
+_token_cache = TTLCache(maxsize=4096, ttl=86400)
+_token_miss_cache = TTLCache(maxsize=4096, ttl=300)
 
-def fetch_token_metadata(mint: str):
-    if mint in _token_cache:
-        return _token_cache[mint]
+def cached_token_metadata(mint: str) -> Optional[tuple]:
+    meta = _token_cache.get(mint)
+    if meta is None:
+        meta = _token_miss_cache.get(mint)
+    return meta
 
+def _parse_token_metadata(meta: dict) -> Optional[tuple]:
     try:
-        url = f"https://api.helius.xyz/v0/token-metadata?api-key={HELIUS_API_KEY}"
-        resp = requests.post(url, json={"mintAccounts": [mint]}, timeout=15)
+        d = meta["onChainMetadata"]["metadata"]["data"]
+        name, symbol = d.get("name"), d.get("symbol")
+    except (KeyError, TypeError, AttributeError):
+        name = symbol = None
+    if name: name = name.strip()
+    if symbol: symbol = symbol.strip()
+    if name or symbol:
+        return (name or "unknown", symbol or "unknown")
+    return None
+
+async def fetch_token_metadata_batch(mints: List[str]):
+    # One POST per HELIUS_METADATA_BATCH uncached mints, run concurrently; results land in the caches
+    mints = [m for m in mints if cached_token_metadata(m) is None]
+    await asyncio.gather(*(
+        _fetch_token_metadata_chunk(mints[i:i + HELIUS_METADATA_BATCH])
+        for i in range(0, len(mints), HELIUS_METADATA_BATCH)
+    ))
+
+async def _fetch_token_metadata_chunk(mints: List[str]):
+    resolved = {}
+    try:
+        resp = await http_request("POST", HELIUS_METADATA_URL, data=orjson.dumps({"mintAccounts": mints}),
+                                  headers=JSON_HEADERS, timeout=aiohttp.ClientTimeout(total=15))
         resp.raise_for_status()
-        data = resp.json()
-        if data and isinstance(data, list) and len(data) > 0:
-            meta = data[0]
-            name = meta.get("onChainMetadata", {}).get("metadata", {}).get("data", {}).get("name")
-            symbol = meta.get("onChainMetadata", {}).get("metadata", {}).get("data", {}).get("symbol")
-            if name: name = name.strip()
-            if symbol: symbol = symbol.strip()
-            _token_cache[mint] = (name or "unknown", symbol or "unknown")
-            return _token_cache[mint]
+        data = orjson.loads(await resp.read())
+        if data and isinstance(data, list):
+            for i, meta in enumerate(data):
+                if not isinstance(meta, dict):
+                    continue
+                mint = meta.get("account") or (mints[i] if i < len(mints) else None)
+                parsed = _parse_token_metadata(meta)
+                if mint and parsed:
+                    resolved[mint] = parsed
     except Exception as e:
-        print(f"[META] Failed to fetch metadata for {mint}: {e}")
+        logger.warning("[META] Failed to fetch metadata for %d mint(s): %s", len(mints), e)
 
-    _token_cache[mint] = ("unknown", "unknown")
-    return _token_cache[mint]
+    for mint in mints:
+        if mint in resolved:
+            _token_cache[mint] = resolved[mint]
+        else:
+            _token_miss_cache[mint] = UNKNOWN_META
 
 # ===== TOKEN DETAIL EXTRACTION =====
 def ts_to_iso(ts_seconds: int) -> str:
-    return datetime.fromtimestamp(ts_seconds, tz=timezone.utc).isoformat()
+    # Same output as datetime.fromtimestamp(ts, tz=utc).isoformat() for whole seconds,
+    # without building a datetime per transfer
+    t = time.gmtime(ts_seconds)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}+00:00"
 
+def pick_transfer(tx: dict) -> Optional[dict]:
+    # Prefer a transfer touching the watched wallet, else fall back to the first one
+    transfers = tx.get("tokenTransfers") or []
+    watch = WATCH_WALLET
+    return next(
+        (t for t in islice(transfers, MAX_TRANSFER_SCAN)
+         if watch in (t.get("fromUserAccount"), t.get("toUserAccount"))),
+        transfers[0] if transfers else None,
+    )
+
+def transfer_name_symbol(candidate: dict) -> tuple:
+    # Name/symbol as carried on the transfer itself: nested "token" first, then flat fields
+    try:
+        token_info = candidate["token"]
+        name, symbol = token_info.get("name"), token_info.get("symbol")
+    except (KeyError, TypeError, AttributeError):
+        name = symbol = None
+    return name or candidate.get("tokenName"), symbol or candidate.get("tokenSymbol")
+
+def mint_needing_metadata(tx: dict) -> Optional[str]:
+    candidate = pick_transfer(tx)
+    if not candidate or not candidate.get("mint"):
+        return None
+    name, symbol = transfer_name_symbol(candidate)
+    if name and symbol:
+        return None
+    return candidate["mint"]
+
+# Pure lookup: metadata for the batch is prefetched into the caches by the poll loop
 def extract_token_details(tx: dict):
     signature = tx.get("signature")
     timestamp = tx.get("timestamp")
@@ -108,23 +331,15 @@ def extract_token_details(tx: dict):
     ticker = "unknown"
     mint = "unknown"
 
-    transfers = tx.get("tokenTransfers") or []
-    candidate = None
-    for t in transfers:
-        if t.get("fromUserAccount") == WATCH_WALLET or t.get("toUserAccount") == WATCH_WALLET:
-            candidate = t
-            break
-    if not candidate and transfers:
-        candidate = transfers[0]
-
+    candidate = pick_transfer(tx)
     if candidate:
         mint = candidate.get("mint") or mint
-        token_info = candidate.get("token") or {}
-        token_name = token_info.get("name") or candidate.get("tokenName") or token_name
-        ticker = token_info.get("symbol") or candidate.get("tokenSymbol") or ticker
+        name, symbol = transfer_name_symbol(candidate)
+        token_name = name or token_name
+        ticker = symbol or ticker
 
     if mint != "unknown" and (token_name == "unknown" or ticker == "unknown"):
-        meta_name, meta_symbol = fetch_token_metadata(mint)
+        meta_name, meta_symbol = cached_token_metadata(mint) or UNKNOWN_META
         if token_name == "unknown":
             token_name = meta_name
         if ticker == "unknown":
@@ -139,75 +354,123 @@ def extract_token_details(tx: dict):
     }
 
 # ===== POLLING LOOP =====
-def poll_watch_wallet():
+async def poll_watch_wallet(send_queue: "asyncio.Queue[SendItem]"):
     last_sig = load_last_signature()
-    print(f"[INIT] last_seen_signature={last_sig}")
+    logger.info("[INIT] last_seen_signature=%s", last_sig)
 
     retry_delay = POLL_INTERVAL_SEC
+    idle_count = 0
     last_heartbeat = time.time()
 
     while True:
         try:
-            txs = fetch_recent_transactions(WATCH_WALLET, before=None, limit=20)
+            txs = await fetch_new_transactions(WATCH_WALLET, until=last_sig)
 
             if txs:
-                txs_sorted = sorted(txs, key=lambda t: t.get("timestamp", 0))
-                if last_sig:
-                    new_batch = [t for t in txs_sorted if t.get("signature") != last_sig]
-                else:
-                    new_batch = txs_sorted
-
+                # Pages hold only txs newer than last_sig, newest first; process oldest -> newest
+                new_batch = list(reversed(txs))
+
+                # Alerts go nowhere without Telegram creds and INFO logging; skip building them
+                log_alerts = logger.isEnabledFor(logging.INFO)
+                if _TG_ENABLED or log_alerts:
+                    # Resolve metadata for every uncached mint in the batch with one request
+                    mints_needed = {
+                        m for m in map(mint_needing_metadata, new_batch)
+                        if m and cached_token_metadata(m) is None
+                    }
+                    await fetch_token_metadata_batch(list(mints_needed))
+
+                    for tx in new_batch:
+                        details = extract_token_details(tx)
+                        msg = "".join([
+                            _MSG_HEADER,
+                            "• <b>Token:</b> ", details["token_name"], " (", details["ticker"], ")\n",
+                            "• <b>Mint:</b> ", details["mint"], "\n",
+                            "• <b>Time (UTC):</b> ", details["time"], "\n",
+                            "• <b>Sig:</b> ", str(details["signature"]),
+                        ])
+                        if log_alerts:
+                            logger.info("[ALERT] %s", msg.replace("\n", " | "))
+                        if _TG_ENABLED:
+                            await send_queue.put((msg, tx.get("signature")))
+
+                # In memory, move past the batch so the next poll doesn't re-fetch it
                 for tx in new_batch:
-                    details = extract_token_details(tx)
-                    msg = (
-                        f"New activity on <b>{WATCH_WALLET}</b>\n"
-                        f"• <b>Token:</b> {details['token_name']} ({details['ticker']})\n"
-                        f"• <b>Mint:</b> {details['mint']}\n"
-                        f"• <b>Time (UTC):</b> {details['time']}\n"
-                        f"• <b>Sig:</b> {details['signature']}"
-                    )
-                    print(f"[ALERT] {msg.replace(chr(10),' | ')}")
-                    send_telegram_text(msg)
-                    last_sig = tx.get("signature")
-                    save_last_signature(last_sig)
+                    last_sig = tx.get("signature") or last_sig
 
-                if not load_last_signature() and txs_sorted:
-                    newest_sig = txs_sorted[-1].get("signature")
-                    if newest_sig:
-                        save_last_signature(newest_sig)
-                        last_sig = newest_sig
+                # On disk, the sender advances it as each queued alert goes out. With no
+                # Telegram there is nothing pending: one write per poll, skipped when unchanged.
+                if not _TG_ENABLED:
+                    save_last_signature(last_sig)
 
             # Reset retry delay after success
             retry_delay = POLL_INTERVAL_SEC
 
+            # Back off while idle, snap back to the base rate on activity
+            if txs:
+                idle_count = 0
+                interval = POLL_INTERVAL_SEC
+            else:
+                idle_count += 1
+                interval = min(POLL_INTERVAL_SEC * 2 ** min(idle_count, 8), MAX_IDLE_INTERVAL)
+
             # Heartbeat every 5 minutes
             if time.time() - last_heartbeat > 300:
-                print("[HEARTBEAT] Watcher is alive.")
+                logger.info("[HEARTBEAT] Watcher is alive.")
                 last_heartbeat = time.time()
 
-            time.sleep(POLL_INTERVAL_SEC)
+            await asyncio.sleep(interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER))
 
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:
-                print(f"[RATE LIMIT] Too many requests. Backing off for {retry_delay}s...")
-                time.sleep(retry_delay)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429:
+                logger.warning("[RATE LIMIT] Too many requests. Backing off for %ss...", retry_delay)
+                await asyncio.sleep(retry_delay)
                 retry_delay = min(retry_delay * 2, MAX_BACKOFF)
             else:
-                print(f"[NETWORK] HTTP error: {e}. Retrying in 10s...")
-                time.sleep(10)
+                logger.warning("[NETWORK] HTTP error: %s. Retrying in 10s...", e)
+                await asyncio.sleep(10)
 
-        except requests.RequestException as e:
-            print(f"[NETWORK] {e}. Retrying in 10s...")
-            time.sleep(10)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("[NETWORK] %r. Retrying in 10s...", e)
+            await asyncio.sleep(10)
 
         except Exception as e:
-            print(f"[ERROR] {e}")
-            time.sleep(5)
+            logger.exception("[ERROR] %s", e)
+            await asyncio.sleep(5)
 
 # ===== MAIN =====
+async def main():
+    # The Procfile worker is stopped with SIGTERM; turn it into a cancellation like
+    # Ctrl-C so the drain below runs instead of the process dying mid-queue.
+    main_task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+    except NotImplementedError:
+        pass   # Windows event loops don't support signal handlers
+
+    send_queue: "asyncio.Queue[SendItem]" = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+    sender = asyncio.create_task(telegram_sender(send_queue, AsyncLimiter(*TELEGRAM_RATE)))
+    try:
+        if _TG_ENABLED:
+            await send_queue.put(("Watcher starting…", None))
+        else:
+            logger.warning("[TELEGRAM] Bot token or chat ID missing — alerts will only be logged.")
+        await poll_watch_wallet(send_queue)
+    finally:
+        # Give queued alerts (e.g. the last batch) a chance to go out before exiting
+        try:
+            await asyncio.wait_for(send_queue.join(), timeout=SHUTDOWN_DRAIN_SEC)
+        except asyncio.TimeoutError:
+            logger.warning("[TELEGRAM] Shutting down with %d alert(s) still queued; "
+                           "they will be re-fetched on next start.", send_queue.qsize())
+        sender.cancel()
+        await close_session()
+
 if __name__ == "__main__":
     for var in ["HELIUS_API_KEY", "WATCH_WALLET"]:
         if not os.getenv(var):
             raise RuntimeError(f"Missing env var: {var}")
-    send_telegram_text("Watcher starting…")
-    poll_watch_wallet()
+    try:
+        asyncio.run(main())
+    except asyncio.CancelledError:
+        logger.info("[SHUTDOWN] Watcher stopped.")